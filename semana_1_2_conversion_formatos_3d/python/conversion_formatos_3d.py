@@ -6,9 +6,12 @@ from __future__ import annotations
 import argparse
 import csv
 import json
+import operator
+import os
 import shutil
 import subprocess
-from dataclasses import asdict, dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from pathlib import Path
 from typing import Dict, Iterable, List, Sequence, Tuple
 
@@ -20,6 +23,7 @@ from mpl_toolkits.mplot3d.art3d import Line3DCollection, Poly3DCollection
 
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
+from matplotlib.figure import SubplotParams
 
 SUPPORTED_INPUTS: Dict[str, str] = {
     ".obj": "OBJ",
@@ -74,23 +78,42 @@ def load_mesh(file_path: Path) -> trimesh.Trimesh:
     return mesh
 
 
+def _pack_quantized_keys(quantized: np.ndarray) -> np.ndarray | None:
+    # Desplazar cada columna a su mínimo y empaquetar x|y|z en un solo int64
+    # cuando los rangos caben en 63 bits; si no, el llamador usa otra clave.
+    offset = quantized - quantized.min(axis=0)
+    bits = [int(span).bit_length() for span in offset.max(axis=0)]
+    if sum(bits) > 63:
+        return None
+    return offset[:, 0] | (offset[:, 1] << bits[0]) | (offset[:, 2] << (bits[0] + bits[1]))
+
+
 def duplicate_vertex_stats(vertices: np.ndarray, decimals: int = 6) -> Tuple[int, int]:
     if len(vertices) == 0:
         return 0, 0
-    rounded = np.round(vertices.astype(np.float64), decimals=decimals)
-    unique = np.unique(rounded, axis=0)
-    duplicates = int(len(vertices) - len(unique))
-    return duplicates, int(len(unique))
-
-
-def to_metrics(file_path: Path, mesh: trimesh.Trimesh) -> MeshMetrics:
+    # Cuantizar a enteros y reducir cada fila a una sola clave 1-D:
+    # np.unique ordena un arreglo plano en vez de hacer lexsort por columnas.
+    # Escalar directo a float64 (sin copia previa con astype) y redondear en sitio.
+    scaled = np.multiply(vertices, 10.0**decimals, dtype=np.float64)
+    quantized = np.ascontiguousarray(np.rint(scaled, out=scaled).astype(np.int64))
+    keys = _pack_quantized_keys(quantized)
+    if keys is None:
+        keys = quantized.view(np.dtype((np.void, quantized.dtype.itemsize * quantized.shape[1]))).ravel()
+    unique_count = len(np.unique(keys))
+    duplicates = int(len(vertices) - unique_count)
+    return duplicates, unique_count
+
+
+def to_metrics(file_path: Path, mesh: trimesh.Trimesh, format_name: str | None = None) -> MeshMetrics:
     duplicates, unique_vertices = duplicate_vertex_stats(mesh.vertices)
     uv = getattr(mesh.visual, "uv", None)
     extents = mesh.bounding_box.extents if mesh.vertices.size else np.array([0.0, 0.0, 0.0])
+    if format_name is None:
+        format_name = SUPPORTED_INPUTS[file_path.suffix.lower()]
 
     return MeshMetrics(
         file_name=file_path.name,
-        format=SUPPORTED_INPUTS[file_path.suffix.lower()],
+        format=format_name,
         vertices=int(len(mesh.vertices)),
         faces=int(len(mesh.faces)),
         edges_unique=int(len(mesh.edges_unique)),
@@ -146,16 +169,32 @@ def downsample_mesh(mesh: trimesh.Trimesh, max_faces: int, seed: int = 7) -> tri
     if len(mesh.faces) <= max_faces:
         return mesh
 
-    rng = np.random.default_rng(seed)
-    face_index = rng.choice(len(mesh.faces), size=max_faces, replace=False)
-    return trimesh.Trimesh(vertices=mesh.vertices.copy(), faces=mesh.faces[face_index], process=False)
-
+    # Los dibujantes comparten la misma muestra por malla. Se guarda en la caché
+    # de trimesh, que se vacía sola si cambian los vértices o caras de la malla.
+    cache_key = ("sampled_for_plot", max_faces, seed)
+    sampled = mesh._cache[cache_key]
+    if sampled is not None:
+        return sampled
 
-def set_equal_axes(ax: plt.Axes, vertices: np.ndarray) -> None:
-    mins = vertices.min(axis=0)
-    maxs = vertices.max(axis=0)
-    center = (mins + maxs) / 2.0
-    radius = float((maxs - mins).max() / 2.0)
+    # argpartition sobre claves aleatorias evita la permutación completa de choice().
+    rng = np.random.default_rng(seed)
+    keys = rng.random(len(mesh.faces))
+    face_index = np.argpartition(keys, max_faces)[:max_faces]
+    sampled = trimesh.Trimesh(vertices=mesh.vertices.copy(), faces=mesh.faces[face_index], process=False)
+    # Materializar una vez las propiedades que usan los dibujantes; trimesh las
+    # guarda en su caché y las siguientes figuras (y el GIF) las reutilizan.
+    _ = sampled.triangles, sampled.edges_unique, sampled.face_normals, sampled.triangles_center
+    mesh._cache[cache_key] = sampled
+    return sampled
+
+
+def set_equal_axes(ax: plt.Axes, mesh: trimesh.Trimesh) -> None:
+    # mesh.bounds queda en la caché de trimesh: no recorre los vértices en cada figura.
+    bounds = mesh.bounds
+    if bounds is None:
+        bounds = np.zeros((2, 3))
+    center = bounds.mean(axis=0)
+    radius = float((bounds[1] - bounds[0]).max() / 2.0)
     radius = radius if radius > 0 else 1.0
 
     ax.set_xlim(center[0] - radius, center[0] + radius)
@@ -181,17 +220,17 @@ def draw_solid(ax: plt.Axes, mesh: trimesh.Trimesh, color: str, max_faces: int)
         alpha=0.95,
     )
     ax.add_collection3d(poly)
-    set_equal_axes(ax, sampled.vertices)
+    set_equal_axes(ax, sampled)
     style_3d_axes(ax)
 
 
 def draw_wireframe(ax: plt.Axes, mesh: trimesh.Trimesh, color: str, max_faces: int) -> None:
     sampled = downsample_mesh(mesh, max_faces=max_faces)
     edges = sampled.edges_unique
-    lines = sampled.vertices[edges]
+    lines = np.take(sampled.vertices, edges, axis=0)
     collection = Line3DCollection(lines, colors=color, linewidths=0.25, alpha=0.9)
     ax.add_collection3d(collection)
-    set_equal_axes(ax, sampled.vertices)
+    set_equal_axes(ax, sampled)
     style_3d_axes(ax)
 
 
@@ -206,7 +245,8 @@ def draw_normals(ax: plt.Axes, mesh: trimesh.Trimesh, color: str, max_faces: int
         centers = centers[idx]
         normals = normals[idx]
 
-    length = float(np.linalg.norm(sampled.bounding_box.extents) * 0.03)
+    extents = sampled.bounding_box.extents
+    length = float(np.sqrt(extents @ extents)) * 0.03
     length = length if length > 0 else 1.0
     ax.quiver(
         centers[:, 0],
@@ -220,27 +260,39 @@ def draw_normals(ax: plt.Axes, mesh: trimesh.Trimesh, color: str, max_faces: int
         length=length,
         linewidth=0.4,
     )
-    set_equal_axes(ax, sampled.vertices)
+    set_equal_axes(ax, sampled)
     style_3d_axes(ax)
 
 
-def plot_grid(
+def create_grid_figure(n_axes: int) -> Tuple[plt.Figure, List[plt.Axes]]:
+    fig = plt.figure(figsize=(5 * n_axes, 4.4))
+    axes = [fig.add_subplot(1, n_axes, idx, projection="3d") for idx in range(1, n_axes + 1)]
+    return fig, axes
+
+
+def plot_grid_on(
+    fig: plt.Figure,
+    axes: Sequence[plt.Axes],
     meshes: Sequence[Tuple[str, trimesh.Trimesh]],
     output_path: Path,
     drawer,
     title: str,
     max_faces: int,
 ) -> None:
-    fig = plt.figure(figsize=(5 * len(meshes), 4.4))
-    for idx, (label, mesh) in enumerate(meshes, start=1):
-        ax = fig.add_subplot(1, len(meshes), idx, projection="3d")
+    if len(axes) != len(meshes):
+        raise ValueError(f"La grilla tiene {len(axes)} ejes pero se recibieron {len(meshes)} mallas.")
+
+    # La figura y los ejes 3D se reutilizan entre grillas: solo se limpian los artistas.
+    for ax, (label, mesh) in zip(axes, meshes):
+        ax.clear()
         color = FORMAT_COLORS.get(label, "#90a4ae")
         drawer(ax, mesh, color, max_faces)
         ax.set_title(f"{label}\nV={len(mesh.vertices)} F={len(mesh.faces)}", fontsize=10)
     fig.suptitle(title, fontsize=12)
+    # tight_layout parte de los márgenes actuales: restaurarlos evita que se acumule.
+    fig.subplots_adjust(**vars(SubplotParams()))
     fig.tight_layout()
     fig.savefig(output_path, dpi=220, bbox_inches="tight")
-    plt.close(fig)
 
 
 def plot_metrics_bars(metrics: Sequence[MeshMetrics], output_path: Path) -> None:
@@ -249,16 +301,19 @@ def plot_metrics_bars(metrics: Sequence[MeshMetrics], output_path: Path) -> None
     x = np.arange(len(keys))
     width = 0.8 / max(len(metrics), 1)
 
+    heights = np.array([[getattr(item, key) for key in keys] for item in metrics], dtype=float)
+    offsets = np.arange(len(metrics)) * width - 0.4
+
     fig, ax = plt.subplots(figsize=(12, 5))
-    for idx, item in enumerate(metrics):
-        values = [getattr(item, key) for key in keys]
-        ax.bar(x + (idx * width) - 0.4 + (width / 2), values, width=width, label=item.format)
+    containers = [
+        ax.bar(x + offsets[idx], heights[idx], width=width, align="edge") for idx in range(len(metrics))
+    ]
 
     ax.set_xticks(x)
     ax.set_xticklabels(labels)
     ax.set_ylabel("Cantidad")
     ax.set_title("Comparación cuantitativa por formato")
-    ax.legend()
+    ax.legend(containers, [item.format for item in metrics])
     ax.grid(axis="y", alpha=0.25)
     fig.tight_layout()
     fig.savefig(output_path, dpi=220, bbox_inches="tight")
@@ -280,15 +335,14 @@ def build_rotation_gif(
         ax.set_title(label, fontsize=10)
         axes.append(ax)
 
-    frames = []
-    for azimuth in np.linspace(0, 360, n_frames, endpoint=False):
+    width, height = fig.canvas.get_width_height()
+    frames = np.empty((n_frames, height, width, 3), dtype=np.uint8)
+    for frame_idx, azimuth in enumerate(np.linspace(0, 360, n_frames, endpoint=False)):
         for ax in axes:
             ax.view_init(elev=22, azim=float(azimuth))
         fig.canvas.draw()
-        width, height = fig.canvas.get_width_height()
-        buffer = np.frombuffer(fig.canvas.buffer_rgba(), dtype=np.uint8)
-        frame = buffer.reshape(height, width, 4)[:, :, :3].copy()
-        frames.append(frame)
+        # Vista (H, W, 4) sin copia del buffer de Agg; solo se copia RGB al cuadro.
+        frames[frame_idx] = np.asarray(fig.canvas.buffer_rgba())[:, :, :3]
 
     imageio.mimsave(output_path, frames, duration=0.07, loop=0)
     plt.close(fig)
@@ -296,7 +350,7 @@ def build_rotation_gif(
 
 def export_conversions(meshes_by_path: Dict[Path, trimesh.Trimesh], output_dir: Path) -> List[Path]:
     output_dir.mkdir(parents=True, exist_ok=True)
-    converted: List[Path] = []
+    tasks: List[Tuple[trimesh.Trimesh, Path, str]] = []
 
     for source_path, mesh in meshes_by_path.items():
         source_ext = source_path.suffix.lower().lstrip(".")
@@ -307,11 +361,31 @@ def export_conversions(meshes_by_path: Dict[Path, trimesh.Trimesh], output_dir:
                 continue
 
             output_name = f"{source_path.stem}_from_{source_ext}.{target}"
-            output_path = output_dir / output_name
+            tasks.append((mesh, output_dir / output_name, target))
+
+    if not tasks:
+        return []
+
+    # Calcular en el hilo principal las normales de cara (las usa STL). No se tocan
+    # las de vértice: OBJ/GLTF solo las exportan si ya están en la caché de trimesh.
+    for mesh in meshes_by_path.values():
+        _ = mesh.face_normals
+
+    # OBJ escribe archivos auxiliares con nombre fijo (material.mtl, material_0.png)
+    # en output_dir, así que esas exportaciones van una tras otra en este hilo;
+    # STL y GLB son autocontenidos y se reparten en hilos mientras tanto.
+    serial_tasks = [task for task in tasks if task[2] == "obj"]
+    pooled_tasks = [task for task in tasks if task[2] != "obj"]
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(pooled_tasks)))) as executor:
+        futures = [
+            executor.submit(mesh.export, output_path, file_type=target) for mesh, output_path, target in pooled_tasks
+        ]
+        for mesh, output_path, target in serial_tasks:
             mesh.export(output_path, file_type=target)
-            converted.append(output_path)
+        for future in futures:
+            future.result()
 
-    return converted
+    return [output_path for _, output_path, _ in tasks]
 
 
 def write_metrics_report(metrics: Sequence[MeshMetrics], output_dir: Path) -> Tuple[Path, Path]:
@@ -319,12 +393,15 @@ def write_metrics_report(metrics: Sequence[MeshMetrics], output_dir: Path) -> Tu
     csv_path = output_dir / "comparison_metrics.csv"
     json_path = output_dir / "comparison_metrics.json"
 
-    rows = [asdict(metric) for metric in metrics]
+    # Los campos son planos: leerlos directo evita la copia profunda de asdict().
+    field_names = [field.name for field in fields(MeshMetrics)]
+    getter = operator.attrgetter(*field_names)
     with csv_path.open("w", newline="", encoding="utf-8") as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=list(rows[0].keys()))
-        writer.writeheader()
-        writer.writerows(rows)
+        writer = csv.writer(csv_file)
+        writer.writerow(field_names)
+        writer.writerows(getter(metric) for metric in metrics)
 
+    rows = [dict(zip(field_names, getter(metric))) for metric in metrics]
     json_path.write_text(json.dumps(rows, indent=2, ensure_ascii=False), encoding="utf-8")
     return csv_path, json_path
 
@@ -374,18 +451,24 @@ def run_workshop(
             f"No se encontraron modelos compatibles en {models_dir}. "
             "Se esperan archivos .obj, .stl, .glb o .gltf."
         )
+    fmt_by_path: Dict[Path, str] = {path: SUPPORTED_INPUTS[path.suffix.lower()] for path in files}
 
-    meshes_by_path: Dict[Path, trimesh.Trimesh] = {}
-    metrics: List[MeshMetrics] = []
-    for file_path in files:
+    def process(file_path: Path) -> Tuple[Path, trimesh.Trimesh, MeshMetrics]:
         mesh = load_mesh(file_path)
-        meshes_by_path[file_path] = mesh
-        mesh_metrics = to_metrics(file_path, mesh)
+        mesh_metrics = to_metrics(file_path, mesh, fmt_by_path[file_path])
         if with_open3d:
             enrich_with_open3d(mesh_metrics, file_path)
         if with_assimp:
             enrich_with_assimp_info(mesh_metrics, file_path)
-        metrics.append(mesh_metrics)
+        return file_path, mesh, mesh_metrics
+
+    # Carga, métricas y enriquecimiento (Open3D/assimp) bloquean en disco o en
+    # subprocesos, así que cada archivo se procesa en su propio hilo.
+    with ThreadPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1)) as executor:
+        results = list(executor.map(process, files))
+
+    meshes_by_path: Dict[Path, trimesh.Trimesh] = {path: mesh for path, mesh, _ in results}
+    metrics: List[MeshMetrics] = [mesh_metrics for _, _, mesh_metrics in results]
 
     metrics.sort(key=lambda item: (item.format, item.file_name))
     print_summary_table(metrics)
@@ -400,29 +483,39 @@ def run_workshop(
     print(f"Reporte JSON: {report_json}")
 
     media_dir.mkdir(parents=True, exist_ok=True)
-    mesh_pairs = [(SUPPORTED_INPUTS[path.suffix.lower()], mesh) for path, mesh in meshes_by_path.items()]
-
-    plot_grid(
-        mesh_pairs,
-        media_dir / "python_format_comparison.png",
-        drawer=draw_solid,
-        title="Comparación de formatos (sólido)",
-        max_faces=max_plot_faces,
-    )
-    plot_grid(
-        mesh_pairs,
-        media_dir / "python_wireframe_comparison.png",
-        drawer=draw_wireframe,
-        title="Comparación de formatos (wireframe)",
-        max_faces=max_plot_faces,
-    )
-    plot_grid(
-        mesh_pairs,
-        media_dir / "python_normals_comparison.png",
-        drawer=draw_normals,
-        title="Comparación de normales de cara",
-        max_faces=max_plot_faces,
-    )
+    mesh_pairs = [(fmt_by_path[path], mesh) for path, mesh in meshes_by_path.items()]
+
+    grid_fig, grid_axes = create_grid_figure(len(mesh_pairs))
+    try:
+        plot_grid_on(
+            grid_fig,
+            grid_axes,
+            mesh_pairs,
+            media_dir / "python_format_comparison.png",
+            drawer=draw_solid,
+            title="Comparación de formatos (sólido)",
+            max_faces=max_plot_faces,
+        )
+        plot_grid_on(
+            grid_fig,
+            grid_axes,
+            mesh_pairs,
+            media_dir / "python_wireframe_comparison.png",
+            drawer=draw_wireframe,
+            title="Comparación de formatos (wireframe)",
+            max_faces=max_plot_faces,
+        )
+        plot_grid_on(
+            grid_fig,
+            grid_axes,
+            mesh_pairs,
+            media_dir / "python_normals_comparison.png",
+            drawer=draw_normals,
+            title="Comparación de normales de cara",
+            max_faces=max_plot_faces,
+        )
+    finally:
+        plt.close(grid_fig)
     plot_metrics_bars(metrics, media_dir / "python_metrics_bar.png")
 
     if build_gif: